@@ -4,57 +4,171 @@ Analyzes Reddit posts and comments using OpenAI API
 """
 
 import os
+import re
 import json
 import time
+import random
+import struct
+import html
+import hashlib
+import functools
+import atexit
+import queue
 import logging
 import threading
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Union
+from collections import OrderedDict, defaultdict
+from itertools import islice
 import concurrent.futures
 
+import httpx
+import orjson
+import requests
+import requests.models
+from requests.adapters import HTTPAdapter
 import telebot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 import praw
 import prawcore
 import openai
 import zai
+import zai.core._errors
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerThreadPool
 
 
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
+
+class _OrjsonCodec:
+    """Stand-in for the json module behind requests' Response.json()"""
+    dumps = staticmethod(json.dumps)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+
+# prawcore and telebot decode every API response with Response.json(); route
+# that through orjson, whose JSONDecodeError subclasses the stdlib one
+requests.models.complexjson = _OrjsonCodec
+
+
+# Configure logging. Worker threads only enqueue records; a listener thread
+# does the file and console writes so logging never blocks a request.
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = [
+    logging.FileHandler('bot.log'),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # The listener's handlers add the real format
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
 logger = logging.getLogger(__name__)
 
 
+# Used when prompt.txt is missing. It opens every AI request unchanged, which
+# lets providers reuse their cached prefix for it across requests
+DEFAULT_ANALYSIS_PROMPT = """
+Analyze the following Reddit post and comments. Extract and summarize:
+
+1. **Key Insights**: New information or important discoveries
+2. **Interesting Discussions**: Notable debates or conversations
+3. **Useful Tips**: Practical advice or recommendations
+4. **Notable Perspectives**: Unique opinions or viewpoints
+5. **Trending Topics**: Popular or controversial subjects
+
+Provide a concise, well-structured summary highlighting the most valuable content.
+Focus on information that would be useful and interesting to someone following this topic.
+Use clear sections and bullet points for readability.
+
+If the content is not particularly noteworthy, briefly explain why and provide a short summary instead.
+""".strip()
+
+# How each post and comment is laid out in the AI request; the fields are
+# those of the post and comment dicts built by RedditAnalyzer.fetch_posts
+POST_TEMPLATE = """
+POST #{idx}:
+TITLE: {title}
+SUBREDDIT: r/{subreddit}
+SCORE: {score} upvotes | {num_comments} comments
+TIME: {time}
+URL: https://www.reddit.com{permalink}
+
+POST CONTENT:
+{content}
+
+TOP COMMENTS:
+"""
+COMMENT_TEMPLATE = "\n{i}. [↑{score}] u/{author}: {body}\n"
+
+def _atomic_write(path: str, data: Union[str, bytes]):
+    """Write a file via a temporary copy so a crash never leaves it truncated"""
+    tmp_path = path + '.tmp'
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
 class Config:
     """Configuration management"""
     def __init__(self):
         self.telegram_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.openai_api_key = os.getenv('OPENAI_API_KEY', '')
         self.openai_base_url = os.getenv('OPENAI_BASE_URL', '')
-        self.use_zai = os.getenv('USE_ZAI', 'false')
+        self.use_zai = os.getenv('USE_ZAI', 'false').strip().lower() == 'true'
         self.zai_api_key = os.getenv('ZAI_API_KEY', '')
         self.model_name = os.getenv('MODEL_NAME', '')
         self.reddit_client_id = os.getenv('REDDIT_CLIENT_ID', '')
         self.reddit_client_secret = os.getenv('REDDIT_CLIENT_SECRET', '')
         self.reddit_user_agent = os.getenv('REDDIT_USER_AGENT', 'RedditAnalyzerBot/1.0')
+        self.max_concurrent_fetches = int(os.getenv('MAX_CONCURRENT_FETCHES', '4'))
+        self.max_concurrent_analyses = int(os.getenv('MAX_CONCURRENT_ANALYSES', '8'))
+        self.combine_subreddits = os.getenv('COMBINE_SUBREDDITS', 'false').strip().lower() == 'true'
+        # Scheduled runs go through OpenAI's Batch API (not offered by z.ai)
+        self.use_batch_api = (
+            os.getenv('USE_BATCH_API', 'false').strip().lower() == 'true' and not self.use_zai
+        )
+        self.personal_chat_id = self._parse_chat_id(os.getenv('PERSONAL_CHAT_ID', ''))
+        # Shared request budgets; 0 disables the corresponding limit
+        self.reddit_requests_per_minute = int(os.getenv('REDDIT_REQUESTS_PER_MINUTE', '60'))
+        self.llm_requests_per_minute = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '0'))
+        self.llm_tokens_per_minute = int(os.getenv('LLM_TOKENS_PER_MINUTE', '0'))
         
         # File paths
         self.subreddits_file = 'subreddits.txt'
         self.prompt_file = 'prompt.txt'
         
+        # Subreddit edits are written back after a short delay so bursts of
+        # changes from the Telegram handlers cost a single write
+        self.flush_delay = 5.0
+        self._dirty = False
+        self._flush_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+        
         self._load_subreddits()
-        self._load_prompt()
+    
+    @staticmethod
+    def _parse_chat_id(value: str) -> Optional[int]:
+        """Chat that receives the scheduled analyses, or None if not configured"""
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            logger.error(f"PERSONAL_CHAT_ID must be a numeric chat ID, got {value!r}")
+            return None
     
     def _load_subreddits(self):
         """Load subreddits from file"""
@@ -64,136 +178,696 @@ class Config:
         except FileNotFoundError:
             self.subreddits = ['Python', 'MachineLearning', 'Programming']
             self._save_subreddits()
+        self._invalidate_rendered()
+    
+    def _invalidate_rendered(self):
+        """Drop the cached subreddit list strings; they're rebuilt on next use"""
+        self._rendered_joined: Optional[str] = None
+        self._rendered_bulleted: Optional[str] = None
+    
+    @property
+    def subreddits_joined(self) -> str:
+        """Subreddits as a comma-separated list for bot messages"""
+        if self._rendered_joined is None:
+            self._rendered_joined = ', '.join(f'r/{sub}' for sub in self.subreddits)
+        return self._rendered_joined
+    
+    @property
+    def subreddits_bulleted(self) -> str:
+        """Subreddits as a bulleted list for bot messages"""
+        if self._rendered_bulleted is None:
+            self._rendered_bulleted = '\n'.join(f'• r/{sub}' for sub in self.subreddits)
+        return self._rendered_bulleted
     
     def _save_subreddits(self):
         """Save subreddits to file"""
-        with open(self.subreddits_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(self.subreddits))
+        _atomic_write(self.subreddits_file, '\n'.join(self.subreddits))
+    
+    def _mark_dirty(self):
+        """Schedule a write of the subreddit list if one isn't pending already"""
+        with self._flush_lock:
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush(self):
+        """Write pending subreddit changes to disk"""
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            try:
+                self._save_subreddits()
+            except OSError as e:
+                logger.error(f"Failed to save subreddits: {e}")
     
-    def _load_prompt(self):
-        """Load analysis prompt from file"""
+    @functools.cached_property
+    def analysis_prompt(self) -> str:
+        """Analysis prompt, loaded from file on first use rather than at startup"""
         try:
             with open(self.prompt_file, 'r', encoding='utf-8') as f:
-                self.analysis_prompt = f.read().strip()
+                return f.read().strip()
         except FileNotFoundError:
-            self.analysis_prompt = """
-Analyze the following Reddit post and comments. Extract and summarize:
-
-1. **Key Insights**: New information or important discoveries
-2. **Interesting Discussions**: Notable debates or conversations
-3. **Useful Tips**: Practical advice or recommendations
-4. **Notable Perspectives**: Unique opinions or viewpoints
-5. **Trending Topics**: Popular or controversial subjects
-
-Provide a concise, well-structured summary highlighting the most valuable content.
-Focus on information that would be useful and interesting to someone following this topic.
-Use clear sections and bullet points for readability.
-
-If the content is not particularly noteworthy, briefly explain why and provide a short summary instead.
-            """
-            self._save_prompt()
+            self._save_prompt(DEFAULT_ANALYSIS_PROMPT)
+            return DEFAULT_ANALYSIS_PROMPT
     
-    def _save_prompt(self):
-        """Save current prompt to file"""
-        with open(self.prompt_file, 'w', encoding='utf-8') as f:
-            f.write(self.analysis_prompt)
+    def _save_prompt(self, prompt: str):
+        """Save a prompt to file"""
+        _atomic_write(self.prompt_file, prompt)
     
     def add_subreddit(self, subreddit: str):
         """Add a new subreddit"""
         if subreddit not in self.subreddits:
             self.subreddits.append(subreddit)
-            self._save_subreddits()
+            self._invalidate_rendered()
+            self._mark_dirty()
     
     def remove_subreddit(self, subreddit: str):
         """Remove a subreddit"""
         if subreddit in self.subreddits:
             self.subreddits.remove(subreddit)
-            self._save_subreddits()
+            self._invalidate_rendered()
+            self._mark_dirty()
     
     def set_subreddits(self, subreddits: List[str]):
         """Set the complete list of subreddits"""
         self.subreddits = subreddits
-        self._save_subreddits()
+        self._invalidate_rendered()
+        self._mark_dirty()
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from the Retry-After header of the failed response"""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def retry_on_rate_limit(*exceptions, attempts: int = 6, min_wait: float = 1.0, max_wait: float = 60.0):
+    """Retry a call with jittered exponential backoff when it is rate limited
+    or hits another of the given transient errors.
+
+    A Retry-After header on the error's response takes precedence over the
+    backoff schedule.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except exceptions as e:
+                    if attempt == attempts:
+                        raise
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = random.uniform(min_wait, min(max_wait, min_wait * 2 ** attempt))
+                    delay = min(delay, max_wait)
+                    logger.warning(f"{func.__name__} failed ({e}); retrying in {delay:.1f}s ({attempt}/{attempts})")
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+class TokenBucket:
+    """Thread-safe token bucket refilling `rate` tokens per second up to `capacity`.
+
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    @classmethod
+    def per_minute(cls, limit: float) -> 'TokenBucket':
+        """Bucket allowing `limit` tokens a minute, all of which may be spent in a burst"""
+        return cls(limit / 60, limit)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, n: float = 1):
+        """Block until `n` tokens are available and take them"""
+        if self.rate <= 0:
+            return
+        # More than a full bucket would never fit; settle for draining it
+        n = min(n, self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                self._cond.wait((n - self._tokens) / self.rate)
+
+    def refund(self, n: float):
+        """Give back unused tokens once the real cost is known, or charge more if negative"""
+        if self.rate <= 0:
+            return
+        with self._cond:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + n)
+            self._cond.notify_all()
+
+def build_http_session() -> requests.Session:
+    """Create a keep-alive requests session sized for the bot's worker threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class ProcessedPosts:
+    """Bounded, persistent record of post IDs that were already analyzed.
+
+    The file is an append-only log of fixed-width (post id, last seen)
+    records in which the last record for an ID wins; it is compacted to one
+    record per live ID every `compact_every` appended records and on
+    shutdown. Appends are buffered and written once `flush_bytes` pile up or
+    `flush_delay` seconds pass, so the concurrent fetches of one run share a
+    single write.
+    """
+
+    # Numeric post ID and the Unix time it was last seen
+    RECORD = struct.Struct('<QI')
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None, maxsize: int = 10_000,
+                 ttl: float = 7 * 86400, compact_every: int = 1000, flush_bytes: int = 4096,
+                 flush_delay: float = 0.1):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl  # Only posts younger than 24h are fetched, so a week is plenty
+        self.compact_every = compact_every
+        self.lock = threading.Lock()  # Guards the in-memory state
+        self._io_lock = threading.Lock()  # Guards the file
+        self._writes: List = []  # (compact, data) writes drained but not done yet, oldest first
+        # Keyed by the numeric value of the base36 post ID, which takes a
+        # fraction of the memory of the ID string
+        self._seen: 'OrderedDict[int, float]' = OrderedDict()  # post id -> time last seen, least recent first
+        self.flush_bytes = flush_bytes
+        self.flush_delay = flush_delay
+        self._log = None  # Append handle, opened on first write
+        self._appended = 0  # Records appended since the last compaction
+        self._buffer: List[bytes] = []
+        self._buffered = 0  # Bytes waiting in the buffer
+        self._flush_timer: Optional[threading.Timer] = None
+        if not self._load() and legacy_path:
+            self._load_legacy(legacy_path)
+        atexit.register(self.save)
+
+    @staticmethod
+    def _key(post_id: str) -> int:
+        return int(post_id, 36)
+
+    def _load(self) -> bool:
+        """Load processed post IDs from the file; False if there is none yet"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        # A crash mid-append can leave a partial record at the end
+        whole = len(data) - len(data) % self.RECORD.size
+        self._seen.update(self.RECORD.iter_unpack(data[:whole]))
+        self._sort_and_expire()
+        if whole < len(data):
+            logger.warning(f"Dropping a truncated record at the end of '{self.path}'")
+            # Rewrite now, or later appends would land out of alignment
+            self.save()
+        return True
+
+    def _load_legacy(self, path: str):
+        """Import the text file of "id timestamp" lines used by older versions"""
+        now = time.time()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    fields = line.split()
+                    if not fields:
+                        continue
+                    try:
+                        # Files written before timestamps were tracked hold bare IDs
+                        seen_at = float(fields[1]) if len(fields) > 1 else now
+                        self._seen[self._key(fields[0])] = seen_at
+                    except ValueError:
+                        logger.warning(f"Skipping malformed line in '{path}': {line.strip()}")
+        except FileNotFoundError:
+            logger.info(f"'{self.path}' not found. Starting with an empty set.")
+            return
+        self._sort_and_expire()
+        logger.info(f"Migrating {len(self._seen)} processed post(s) from '{path}' to '{self.path}'")
+        self.save()
+
+    def _sort_and_expire(self):
+        self._seen = OrderedDict(sorted(self._seen.items(), key=lambda item: item[1]))
+        self._expire(time.time())
+
+    def _expire(self, now: float):
+        """Drop entries older than the TTL, then the oldest ones beyond maxsize"""
+        cutoff = now - self.ttl
+        while self._seen and next(iter(self._seen.values())) < cutoff:
+            self._seen.popitem(last=False)
+        while len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+
+    def __contains__(self, post_id: str) -> bool:
+        seen_at = self._seen.get(self._key(post_id))
+        return seen_at is not None and time.time() - seen_at <= self.ttl
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, post_id: str):
+        """Record a post ID as processed"""
+        self.update([post_id])
+
+    def update(self, post_ids: List[str]):
+        """Record several post IDs as seen and queue them for the log.
+
+        IDs that are already known move to the recent end, so posts that keep
+        showing up in hot listings are the last to be evicted.
+        """
+        with self.lock:
+            now = time.time()
+            for post_id in post_ids:
+                key = self._key(post_id)
+                self._seen[key] = now
+                self._seen.move_to_end(key)
+            self._expire(now)
+            records = b''.join(self.RECORD.pack(self._key(post_id), int(now)) for post_id in post_ids)
+            self._buffer.append(records)
+            self._buffered += len(records)
+            self._appended += len(post_ids)
+            if self._buffered >= self.flush_bytes:
+                due = self._drain()
+            else:
+                due = False
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+        if due:
+            self._write()
+
+    def _cancel_flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def _drain(self, compact: bool = False) -> bool:
+        """Queue what is due for the file (lock held); True if there is anything to write.
+
+        Only this bookkeeping runs under self.lock, and it never waits for
+        a write in progress. The queued writes are done by _write once the
+        lock is released, so recording posts never waits on the disk.
+        """
+        self._cancel_flush()
+        if compact or self._appended >= self.compact_every:
+            # The rewrite covers everything still buffered
+            self._expire(time.time())
+            self._appended = 0
+            self._writes.append((True, list(self._seen.items())))
+        elif self._buffer:
+            self._writes.append((False, b''.join(self._buffer)))
+        self._buffer.clear()
+        self._buffered = 0
+        return bool(self._writes)
+
+    def _write(self):
+        """Do every queued write, in the order the writes were queued.
+
+        Whichever thread gets the file first writes what other threads
+        queued before it too, so a caller's data is on disk on return.
+        """
+        with self._io_lock:
+            with self.lock:
+                writes, self._writes = self._writes, []
+            # A rewrite supersedes everything queued before it
+            for start in range(len(writes) - 1, 0, -1):
+                if writes[start][0]:
+                    writes = writes[start:]
+                    break
+            for compact, data in writes:
+                try:
+                    if compact:
+                        # Rewrite the log with only the latest record of each live ID
+                        if self._log is not None:
+                            self._log.close()
+                            self._log = None
+                        _atomic_write(self.path, b''.join(
+                            self.RECORD.pack(key, int(seen_at)) for key, seen_at in data
+                        ))
+                    else:
+                        if self._log is None:
+                            self._log = open(self.path, 'ab')
+                        self._log.write(data)
+                        self._log.flush()
+                except IOError as e:
+                    logger.error(f"Failed to save processed posts: {e}")
+
+    def flush(self):
+        """Write buffered appends to disk"""
+        with self.lock:
+            due = self._drain()
+        if due:
+            self._write()
+
+    def save(self):
+        """Compact the processed posts file."""
+        with self.lock:
+            due = self._drain(compact=True)
+        if due:
+            self._write()
+
+class AnalysisCache:
+    """Persistent cache of AI analyses keyed by a hash of the analyzed content"""
+
+    def __init__(self, path: str, ttl: float = 7 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._entries: Dict[str, List] = {}  # key -> [expires_at, analysis]
+        self._load()
+
+    def _load(self):
+        """Load cached analyses from a file, dropping expired ones"""
+        try:
+            with open(self.path, 'rb') as f:
+                entries = orjson.loads(f.read())
+        except FileNotFoundError:
+            return
+        except (ValueError, IOError) as e:
+            logger.error(f"Failed to load analysis cache, starting empty: {e}")
+            return
+        now = time.time()
+        self._entries = {key: entry for key, entry in entries.items() if entry[0] > now}
+
+    def _save(self):
+        # Held under self.lock, which also keeps two saves off the same temporary file
+        try:
+            _atomic_write(self.path, orjson.dumps(self._entries))
+        except IOError as e:
+            logger.error(f"Failed to save analysis cache: {e}")
+
+    @staticmethod
+    def key_for(posts: List[Dict], context: str = '') -> str:
+        """Hash the posts' content together with whatever else shaped the analysis.
+
+        `context` should cover the prompt and model, so editing prompt.txt
+        or switching models doesn't serve analyses made under the old ones.
+        """
+        digest = hashlib.blake2b(context.encode('utf-8') + b'\2', digest_size=16)
+        for post in posts:
+            digest.update(post['title'].encode('utf-8') + b'\0')
+            digest.update(post['selftext'].encode('utf-8') + b'\0')
+            for comment in post['comments']:
+                digest.update(comment['body'].encode('utf-8') + b'\0')
+            digest.update(b'\1')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def set(self, key: str, analysis: str):
+        with self.lock:
+            now = time.time()
+            self._entries = {k: entry for k, entry in self._entries.items() if entry[0] > now}
+            self._entries[key] = [now + self.ttl, analysis]
+            self._save()
+
+class PendingBatches:
+    """Persistent record of Batch API jobs whose results haven't been delivered yet"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        # batch_id -> {"chat_id": ..., "subreddits": {subreddit: [cache_key, post_count]}}
+        self._batches: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                self._batches = orjson.loads(f.read())
+        except FileNotFoundError:
+            return
+        except (ValueError, IOError) as e:
+            logger.error(f"Failed to load pending batches, starting empty: {e}")
+
+    def _save(self):
+        try:
+            _atomic_write(self.path, orjson.dumps(self._batches))
+        except IOError as e:
+            logger.error(f"Failed to save pending batches: {e}")
+
+    def items(self) -> List:
+        with self.lock:
+            return list(self._batches.items())
+
+    def add(self, batch_id: str, chat_id: int, subreddits: Dict[str, List]):
+        with self.lock:
+            self._batches[batch_id] = {"chat_id": chat_id, "subreddits": subreddits}
+            self._save()
+
+    def remove(self, batch_id: str):
+        with self.lock:
+            if self._batches.pop(batch_id, None) is not None:
+                self._save()
+
+# Rough characters per token for English text; good enough to budget prompts
+# without tying the bot to one provider's tokenizer
+CHARS_PER_TOKEN = 4
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _truncate_words(text: str, limit: int) -> str:
+    """Shorten text to at most `limit` characters, cutting at a word boundary"""
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(' ', 0, limit)
+    # Fall back to a hard cut when the text has no usable space
+    return text[:cut if cut > limit // 2 else limit].rstrip()
+
+@functools.lru_cache(maxsize=4096)
+def _fmt_ts(ts: int) -> str:
+    """Format a post timestamp for the prompt; posts recur across runs, so results are memoized"""
+    t = time.gmtime(ts)
+    # Built by hand, which is cheaper than strftime; UTC so the prompt
+    # doesn't depend on the host's timezone
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} {t.tm_hour:02d}:{t.tm_min:02d} UTC"
 
 class RedditAnalyzer:
     """Reddit data fetcher and analyzer with persistent state"""
     
-    def __init__(self, config: Config):
+    # Appended to the analysis prompt when several subreddits share one request
+    COMBINED_INSTRUCTIONS = (
+        "\n\nThe content covers several subreddits, each introduced by a '## SUBREDDIT:' header. "
+        "Write a separate summary for every subreddit and wrap each one in "
+        '<section sub="NAME">...</section>, where NAME is the subreddit name without "r/".'
+    )
+    SECTION_PATTERN = re.compile(r'<section sub="([^"]+)">(.*?)</section>', re.S)
+    # Prompt tokens one subreddit's posts may spend on their comments, together
+    COMMENT_TOKEN_BUDGET = 3000
+    # Posts whose titles, text and comments add up to less than this are
+    # listed instead of sent to the AI
+    MIN_CONTENT_CHARS = 400
+    
+    def __init__(self, config: Config, http_session: Optional[requests.Session] = None):
         self.config = config
-        self.reddit = praw.Reddit(
-            client_id=config.reddit_client_id,
-            client_secret=config.reddit_client_secret,
-            user_agent=config.reddit_user_agent
+        # Keep-alive pool shared by every PRAW instance, so a run reuses warm
+        # connections to reddit.com instead of handshaking per thread
+        self.http_session = http_session or build_http_session()
+        self._local = threading.local()
+        # Long-lived workers so each thread keeps its authenticated PRAW instance between runs
+        self._fetch_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, config.max_concurrent_fetches),
+            thread_name_prefix='reddit-fetch'
+        )
+        # Comment requests fan out from the fetch workers; a pool of their own
+        # keeps fetch workers from waiting on each other for a free thread
+        self._comment_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, config.max_concurrent_fetches) * 2,
+            thread_name_prefix='reddit-comments'
+        )
+        # The AI calls are network-bound, so threads overlap their latency;
+        # the worker cap keeps us under the provider's rate limits
+        self._analysis_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, config.max_concurrent_analyses),
+            thread_name_prefix='ai-analysis'
         )
-        if config.use_zai == "false":
+        # HTTP/2 multiplexes the concurrent analyses over a single keep-alive
+        # connection. Replies are not streamed, so nothing arrives until the
+        # whole completion is generated: reads keep each SDK's default timeout
+        # (600s OpenAI, 300s z.ai) and only the connect phase gets a short one
+        ai_pool_size = max(50, config.max_concurrent_analyses)
+        # Keep every pooled connection warm between runs rather than closing
+        # all but 20 after each burst of analyses
+        ai_limits = httpx.Limits(max_connections=ai_pool_size, max_keepalive_connections=ai_pool_size)
+        if not config.use_zai:
             self.openai_client = openai.OpenAI(
                 api_key=config.openai_api_key,
                 base_url=config.openai_base_url,
+                http_client=openai.DefaultHttpxClient(http2=True, limits=ai_limits, timeout=httpx.Timeout(600.0, connect=5.0)),
             )
+            # Chat requests retry through _create_with_openai; retrying inside
+            # the SDK as well would multiply the attempts. The Batch API calls
+            # keep the SDK's retries
+            self._openai_chat = self.openai_client.with_options(max_retries=0)
         else:
             self.zai_client = zai.ZaiClient(
                 api_key=config.zai_api_key,
+                http_client=httpx.Client(http2=True, limits=ai_limits, timeout=httpx.Timeout(300.0, connect=5.0)),
+                max_retries=0,  # Retried by _create_with_zai
             )
+        # Resolve the provider once instead of branching on every request
+        self._chat_create = self._create_with_zai if config.use_zai else self._create_with_openai
+        # Shared by every worker thread, so parallel fetches and analyses
+        # stay within the API quotas together
+        self.reddit_rl = TokenBucket.per_minute(config.reddit_requests_per_minute)
+        self.llm_req_rl = TokenBucket.per_minute(config.llm_requests_per_minute)
+        self.llm_tok_rl = TokenBucket.per_minute(config.llm_tokens_per_minute)
 
-        self.processed_posts_file = 'processed_posts.txt'
-        self.processed_posts: Set[str] = self._load_processed_posts()
-        self.lock = threading.Lock()
+        self.processed_posts_file = 'processed_posts.bin'
+        self.processed_posts = ProcessedPosts(self.processed_posts_file, legacy_path='processed_posts.txt')
+        self.analysis_cache_file = 'analysis_cache.json'
+        self.analysis_cache = AnalysisCache(self.analysis_cache_file)
+        self.pending_batches_file = 'pending_batches.json'
+        self.pending_batches = PendingBatches(self.pending_batches_file)
+
+    # The instructions are identical for every request, so the messages are
+    # built once, on the first analysis
+    @functools.cached_property
+    def _system_message(self) -> Dict[str, str]:
+        return {"role": "system", "content": self.config.analysis_prompt}
+
+    @functools.cached_property
+    def _combined_system_message(self) -> Dict[str, str]:
+        return {"role": "system", "content": self.config.analysis_prompt + self.COMBINED_INSTRUCTIONS}
+
+    @functools.cached_property
+    def _cache_context(self) -> str:
+        return f"{self.config.model_name}\0{self.config.analysis_prompt}"
+
+    @property
+    def reddit(self) -> praw.Reddit:
+        """PRAW instance for the calling thread (PRAW itself is not thread-safe)"""
+        reddit = getattr(self._local, 'reddit', None)
+        if reddit is None:
+            reddit = praw.Reddit(
+                client_id=self.config.reddit_client_id,
+                client_secret=self.config.reddit_client_secret,
+                user_agent=self.config.reddit_user_agent,
+                requestor_kwargs={'session': self.http_session}
+            )
+            self._local.reddit = reddit
+        return reddit
+
+    def fetch_hot_listings(self, subreddits: List[str], limit: int = 8) -> Dict[str, List]:
+        """Fetch the hot listings of several subreddits with one multireddit request.
+
+        Only subreddits that got a full `limit` posts from the combined
+        listing are returned; busier subreddits can crowd quieter ones out
+        of it, so the rest should be listed individually.
+        """
+        if len(subreddits) < 2:
+            return {}
+
+        def fetch():
+            by_name = {sub.lower(): sub for sub in subreddits}
+            buckets = defaultdict(list)
+            # One page is a single request however many subreddits it covers
+            for submission in self._list_hot('+'.join(subreddits), limit=100):
+                subreddit = by_name.get(submission.subreddit.display_name.lower())
+                if subreddit and len(buckets[subreddit]) < limit:
+                    buckets[subreddit].append(submission)
+            return {sub: items for sub, items in buckets.items() if len(items) >= limit}
 
-    def _load_processed_posts(self) -> Set[str]:
-        """Load processed post IDs from a file."""
         try:
-            with open(self.processed_posts_file, 'r', encoding='utf-8') as f:
-                return {line.strip() for line in f if line.strip()}
-        except FileNotFoundError:
-            logger.info(f"'{self.processed_posts_file}' not found. Starting with an empty set.")
-            return set()
+            # Runs on a fetch worker so it reuses that thread's authenticated PRAW instance
+            return self._fetch_executor.submit(fetch).result()
+        except Exception as e:
+            logger.error(f"Combined hot listing failed, listing subreddits individually: {e}")
+            return {}
 
-    def _save_processed_posts(self):
-        """Save processed post IDs to a file."""
-        with self.lock:
-            try:
-                with open(self.processed_posts_file, 'w', encoding='utf-8') as f:
-                    for post_id in self.processed_posts:
-                        f.write(f"{post_id}\n")
-            except IOError as e:
-                logger.error(f"Failed to save processed posts: {e}")
-
-    def fetch_posts(self, subreddit_name: str, limit: int = 8) -> List[Dict]:
-        """Fetch recent posts from a subreddit"""
+    @retry_on_rate_limit(prawcore.exceptions.TooManyRequests)
+    def _list_hot(self, subreddit_name: str, limit: int) -> List:
+        """Fetch a hot listing; materialized here so a throttled request can be retried"""
+        self.reddit_rl.acquire()
+        return list(self.reddit.subreddit(subreddit_name).hot(limit=limit))
+
+    @retry_on_rate_limit(prawcore.exceptions.TooManyRequests)
+    def _load_comments(self, submission_id: str):
+        """Load a submission's top comments in a single request.
+
+        Goes through this thread's own PRAW instance, since listings may come
+        from another worker, and asks for the top comments up front instead
+        of expanding "load more" stubs, which costs an extra request each.
+        """
+        self.reddit_rl.acquire()
+        submission = self.reddit.submission(id=submission_id)
+        submission.comment_sort = 'top'
+        submission.comment_limit = 20
+        return submission.comments
+
+    def fetch_posts(self, subreddit_name: str, limit: int = 8, submissions: Optional[List] = None) -> List[Dict]:
+        """Fetch recent posts from a subreddit, or from an already fetched listing of it"""
         try:
-            subreddit = self.reddit.subreddit(subreddit_name)
+            if submissions is None:
+                submissions = self._list_hot(subreddit_name, limit=limit)
             posts = []
+            # Staged locally and recorded in one go once the listing is done
+            new_ids = []
+            seen_again = []
+            candidates = []
+            now = time.time()
             
-            for submission in subreddit.hot(limit=limit):
+            for submission in submissions:
                 if submission.id in self.processed_posts:
+                    seen_again.append(submission.id)
                     continue
                 
-                if time.time() - submission.created_utc > 86400: # Older than 24 hours
+                # Cheap checks on the listing data first, so rejected posts never
+                # cost a comment request
+                if now - submission.created_utc > 86400: # Older than 24 hours
                     continue
-                
-                submission.comments.replace_more(limit=5)
-                comments = []
-                for comment in submission.comments.list()[:15]:
-                    if hasattr(comment, 'body') and len(comment.body) > 10 and comment.body != '[deleted]':
-                        comments.append({
-                            'author': str(comment.author) if comment.author else 'Unknown',
-                            'body': comment.body[:800],
-                            'score': comment.score
-                        })
-                
+                if submission.stickied:
+                    continue
+                # Could never pass the score-or-discussion check below
+                if submission.score <= 5 and submission.num_comments <= 2:
+                    continue
+                candidates.append(submission)
+            
+            # One comment request per post, all in flight at once
+            comment_lists = self._comment_executor.map(self._top_comments, [s.id for s in candidates])
+            for submission, comments in zip(candidates, comment_lists):
                 if submission.score > 5 or len(comments) > 2:
                     post_data = {
-                        'id': submission.id, 'title': submission.title, 'selftext': submission.selftext[:1000],
+                        'id': submission.id, 'title': submission.title, 'selftext': _truncate_words(submission.selftext, 1000),
                         'url': submission.url, 'score': submission.score, 'num_comments': submission.num_comments,
                         'created_utc': submission.created_utc, 'subreddit': subreddit_name,
-                        'permalink': submission.permalink, 'comments': comments
+                        'permalink': submission.permalink,
+                        'comments': comments
                     }
                     posts.append(post_data)
-                    with self.lock:
-                        self.processed_posts.add(submission.id)
+                    new_ids.append(submission.id)
             
-            if posts: # Save only if new posts were found
-                self._save_processed_posts()
+            if new_ids or seen_again:
+                self.processed_posts.update(new_ids + seen_again)
+            self._pack_comments(posts)
             
             return posts
         
@@ -201,93 +875,404 @@ class RedditAnalyzer:
             logger.error(f"PRAW error fetching from r/{subreddit_name}: {e}")
             return []
         except Exception as e:
-            logger.error(f"Unexpected error fetching posts from r/{subreddit_name}: {e}")
+            logger.exception(f"Unexpected error fetching posts from r/{subreddit_name}: {e}")
             return []
 
+    def _top_comments(self, submission_id: str) -> List[Dict]:
+        """Collect up to 15 usable top-level comments of a submission"""
+        # Walk the top-level comments lazily and stop at the first 15 usable
+        # ones instead of flattening the whole forest with .list()
+        usable = (
+            c for c in self._load_comments(submission_id)
+            if not isinstance(c, praw.models.MoreComments) and len(c.body) > 10 and c.body != '[deleted]'
+        )
+        return [{
+            'author': str(comment.author) if comment.author else 'Unknown',
+            'body': _truncate_words(comment.body, 800),
+            'score': comment.score
+        } for comment in islice(usable, 15)]
+
+    @classmethod
+    def _pack_comments(cls, posts: List[Dict], max_count: int = 8):
+        """Trim each post's comments so the whole subreddit fits its comment token budget.
+
+        Comments are picked in rounds, posts in score order: every round
+        offers each post its next highest-scoring comment, so the budget is
+        spread across the posts instead of going to the first few.
+        """
+        remaining = cls.COMMENT_TOKEN_BUDGET
+        ranked = [sorted(post['comments'], key=lambda c: c['score'], reverse=True) for post in posts]
+        picked: List[List[Dict]] = [[] for _ in posts]
+        order = sorted(range(len(posts)), key=lambda i: posts[i]['score'], reverse=True)
+        for rank in range(max(map(len, ranked), default=0)):
+            for i in order:
+                if rank >= len(ranked[i]) or len(picked[i]) == max_count:
+                    continue
+                cost = _estimate_tokens(ranked[i][rank]['body'])
+                # Skip rather than stop: a shorter, lower-scored comment may still fit
+                if cost <= remaining:
+                    picked[i].append(ranked[i][rank])
+                    remaining -= cost
+        for post, comments in zip(posts, picked):
+            post['comments'] = comments
+
+    def _cache_key(self, posts: List[Dict]) -> str:
+        return AnalysisCache.key_for(posts, self._cache_context)
+
+    def submit_fetch(self, subreddit_name: str, limit: int = 8, submissions: Optional[List] = None) -> concurrent.futures.Future:
+        """Fetch a subreddit's posts on the Reddit worker pool"""
+        return self._fetch_executor.submit(self.fetch_posts, subreddit_name, limit, submissions)
+
+    @staticmethod
+    def _build_prompt_content(posts: List[Dict]) -> str:
+        """Render posts and their top comments as the user message for the AI"""
+        parts = []
+        for idx, post in enumerate(posts, 1):
+            parts.append(POST_TEMPLATE.format(
+                idx=idx, time=_fmt_ts(int(post['created_utc'])),
+                content=post['selftext'] or 'No text content (link post)', **post
+            ))
+            parts.extend(
+                COMMENT_TEMPLATE.format(i=i, **comment)
+                for i, comment in enumerate(post['comments'], 1)
+            )
+            parts.append("\n\n")
+        return "".join(parts)
+
+    # The chat clients are built with SDK retries off, so these decorators are
+    # the only retry layer: about as many attempts as the SDKs would make, but
+    # with jittered backoff
+    @retry_on_rate_limit(openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError, attempts=3)
+    def _create_with_openai(self, messages: List[Dict], max_tokens: int = 4000):
+        return self._openai_chat.chat.completions.create(
+            model=self.config.model_name,
+            messages=messages, max_tokens=max_tokens, temperature=0.7
+        )
+
+    @retry_on_rate_limit(zai.core._errors.APIReachLimitError, zai.core._errors.APIInternalError,
+                         zai.core._errors.APIServerFlowExceedError, zai.core._errors.APIConnectionError, attempts=3)
+    def _create_with_zai(self, messages: List[Dict], max_tokens: int = 4000):
+        return self.zai_client.chat.completions.create(
+            model=self.config.model_name,
+            messages=messages, thinking={"type": "disabled"}, max_tokens=max_tokens, temperature=0.7
+        )
+
+    def _complete(self, messages: List[Dict], max_tokens: int = 4000):
+        """Send a chat completion once the shared request and token budgets allow it"""
+        # Prompt estimate plus the room reserved for the reply
+        estimate = sum(_estimate_tokens(m['content']) for m in messages) + max_tokens
+        self.llm_req_rl.acquire()
+        self.llm_tok_rl.acquire(estimate)
+        response = self._chat_create(messages, max_tokens=max_tokens)
+        used = getattr(getattr(response, 'usage', None), 'total_tokens', None)
+        if used is not None:
+            self.llm_tok_rl.refund(estimate - used)
+        return response
+
+    def _analysis_messages(self, posts: List[Dict]) -> List[Dict]:
+        return [
+            self._system_message,
+            {"role": "user", "content": f"CONTENT TO ANALYZE:\n{self._build_prompt_content(posts)}"}
+        ]
+
+    @staticmethod
+    def _brief_listing(posts: List[Dict]) -> str:
+        """Stand-in for an analysis of posts with too little text to be worth summarizing"""
+        links = '\n'.join(
+            f'• <a href="https://www.reddit.com{post["permalink"]}">{html.escape(post["title"])}</a>'
+            for post in posts
+        )
+        return f"<b>Too little content to summarize.</b> New posts:\n{links}"
+
+    @staticmethod
+    def _content_chars(posts: List[Dict]) -> int:
+        """Length of the text written by posters and commenters, without the prompt's framing"""
+        return sum(
+            len(post['title']) + len(post['selftext']) + sum(len(comment['body']) for comment in post['comments'])
+            for post in posts
+        )
+
+    def instant_analysis(self, posts: List[Dict], cache_key: Optional[str] = None) -> Optional[str]:
+        """Analysis of these posts that needs no AI request, if there is one.
+
+        That is an analysis cached by an earlier run, or a plain listing of
+        the posts when their combined text is too thin to be worth a request.
+        """
+        cached = self.analysis_cache.get(cache_key or self._cache_key(posts))
+        if cached:
+            logger.info(f"Reusing cached analysis for {len(posts)} post(s)")
+            return cached
+        if self._content_chars(posts) < self.MIN_CONTENT_CHARS:
+            logger.info(f"Skipping AI request for {len(posts)} post(s) with too little content")
+            return self._brief_listing(posts)
+        return None
+
     def analyze_posts_batch(self, posts: List[Dict]) -> Optional[str]:
         """Analyze multiple posts in a single AI request"""
         if not posts:
             return None
 
-        combined_content = ""
-        for idx, post in enumerate(posts, 1):
-            post_text = f"""
-POST #{idx}:
-TITLE: {post['title']}
-SUBREDDIT: r/{post['subreddit']}
-SCORE: {post['score']} upvotes | {post['num_comments']} comments
-TIME: {datetime.fromtimestamp(post['created_utc']).strftime('%Y-%m-%d %H:%M')}
-URL: https://www.reddit.com{post['permalink']}
-
-POST CONTENT:
-{post['selftext'] if post['selftext'] else 'No text content (link post)'}
+        cache_key = self._cache_key(posts)
+        instant = self.instant_analysis(posts, cache_key)
+        if instant:
+            return instant
 
-TOP COMMENTS:
-"""
-            sorted_comments = sorted(post['comments'], key=lambda x: x['score'], reverse=True)
-            for i, comment in enumerate(sorted_comments[:8], 1):
-                post_text += f"\n{i}. [↑{comment['score']}] u/{comment['author']}: {comment['body']}\n"
-            combined_content += post_text + "\n\n"
+        messages = self._analysis_messages(posts)
 
         try:
-            if self.config.use_zai == "false":
-                response = self.openai_client.chat.completions.create(
-                    model=self.config.model_name,
-                    messages=[
-                        {"role": "system", "content": self.config.analysis_prompt},
-                        {"role": "user", "content": f"CONTENT TO ANALYZE:\n{combined_content}"}
-                    ], max_tokens=4000, temperature=0.7
-                )
-            else:
-                response = self.zai_client.chat.completions.create(
-                    model=self.config.model_name,
-                    messages=[
-                        {"role": "system", "content": self.config.analysis_prompt},
-                        {"role": "user", "content": f"CONTENT TO ANALYZE:\n{combined_content}"}
-                    ], thinking={"type": "disabled"}, max_tokens=4000, temperature=0.7
-                )
-            
+            response = self._complete(messages)
             analysis = response.choices[0].message.content.strip()
-            return analysis if analysis else None
+            if not analysis:
+                return None
+            self.analysis_cache.set(cache_key, analysis)
+            return analysis
 
         except openai.APIError as e:
-            logger.error(f"OpenAI API error: {e}")
+            logger.exception(f"OpenAI API error: {e}")
             return f"Error: Could not analyze posts due to an AI API error: {e}"
         except Exception as e:
-            logger.error(f"Unexpected error during AI analysis: {e}")
+            logger.exception(f"Unexpected error during AI analysis: {e}")
             return "Error: An unexpected error occurred during analysis."
 
+    def submit_analysis(self, posts: List[Dict]) -> concurrent.futures.Future:
+        """Analyze a batch of posts on the AI worker pool"""
+        return self._analysis_executor.submit(self.analyze_posts_batch, posts)
+
+    def analyze_subreddits_combined(self, posts_by_subreddit: Dict[str, List[Dict]]) -> Dict[str, str]:
+        """Analyze several subreddits in a single AI request.
+
+        Returns the analysis for every subreddit whose section could be
+        parsed from the response; callers fall back to analyze_posts_batch
+        for the rest.
+        """
+        analyses = {}
+        uncached = {}
+        cache_keys = {}
+        for subreddit, posts in posts_by_subreddit.items():
+            cache_keys[subreddit] = self._cache_key(posts)
+            instant = self.instant_analysis(posts, cache_keys[subreddit])
+            if instant:
+                analyses[subreddit] = instant
+            else:
+                uncached[subreddit] = posts
+        if not uncached:
+            return analyses
+
+        parts = []
+        for subreddit, posts in uncached.items():
+            parts.append(f"## SUBREDDIT: r/{subreddit}\n")
+            parts.append(self._build_prompt_content(posts))
+        messages = [
+            self._combined_system_message,
+            {"role": "user", "content": "CONTENT TO ANALYZE:\n" + "".join(parts)}
+        ]
+
+        try:
+            response = self._complete(messages, max_tokens=min(4000 * len(uncached), 16000))
+            text = response.choices[0].message.content or ''
+        except Exception as e:
+            logger.exception(f"Combined AI analysis failed, falling back to per-subreddit requests: {e}")
+            return analyses
+
+        by_name = {sub.lower(): sub for sub in uncached}
+        for name, section in self.SECTION_PATTERN.findall(text):
+            name = name.strip().lower()
+            if name.startswith('r/'):
+                name = name[2:]
+            subreddit = by_name.get(name)
+            section = section.strip()
+            if subreddit and section:
+                analyses[subreddit] = section
+                self.analysis_cache.set(cache_keys[subreddit], section)
+        return analyses
+
+    def submit_combined_analysis(self, posts_by_subreddit: Dict[str, List[Dict]]) -> concurrent.futures.Future:
+        """Analyze several subreddits in one request on the AI worker pool"""
+        return self._analysis_executor.submit(self.analyze_subreddits_combined, posts_by_subreddit)
+
+    def submit_batch(self, posts_by_subreddit: Dict[str, List[Dict]], chat_id: int) -> Optional[str]:
+        """Queue one analysis per subreddit on the OpenAI Batch API, at half the realtime price.
+
+        Results arrive within 24 hours and are picked up by collect_batches.
+        Returns the batch ID, or None if the batch could not be created.
+        """
+        lines = []
+        subreddits = {}
+        for subreddit, posts in posts_by_subreddit.items():
+            lines.append(orjson.dumps({
+                "custom_id": subreddit, "method": "POST", "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.config.model_name, "messages": self._analysis_messages(posts),
+                    "max_tokens": 4000, "temperature": 0.7
+                }
+            }))
+            subreddits[subreddit] = [self._cache_key(posts), len(posts)]
+
+        try:
+            input_file = self.openai_client.files.create(
+                file=('analysis.jsonl', b'\n'.join(lines)), purpose='batch'
+            )
+            batch = self.openai_client.batches.create(
+                input_file_id=input_file.id, endpoint='/v1/chat/completions', completion_window='24h'
+            )
+        except openai.APIError as e:
+            logger.exception(f"Could not create analysis batch: {e}")
+            return None
+
+        self.pending_batches.add(batch.id, chat_id, subreddits)
+        logger.info(f"Queued batch {batch.id} for {len(subreddits)} subreddit(s)")
+        return batch.id
+
+    def collect_batches(self) -> List:
+        """Fetch the results of finished batches.
+
+        Returns (chat_id, subreddit, post_count, analysis) tuples, with
+        analysis None for requests the batch failed on; batches that are
+        still running stay pending for the next call.
+        """
+        results = []
+        pending_batches = self.pending_batches.items()
+        if pending_batches and self.config.use_zai:
+            logger.warning(f"{len(pending_batches)} OpenAI batch(es) left pending; set USE_ZAI=false to collect them")
+            return results
+        for batch_id, pending in pending_batches:
+            try:
+                batch = self.openai_client.batches.retrieve(batch_id)
+                # Expired and cancelled batches still keep the results of the
+                # requests that finished in their output file
+                if batch.status == 'failed' or (batch.status in ('expired', 'cancelled') and not batch.output_file_id):
+                    logger.error(f"Batch {batch_id} ended as {batch.status}: {batch.errors}")
+                    results.extend(
+                        (pending['chat_id'], sub, post_count, None)
+                        for sub, (_, post_count) in pending['subreddits'].items()
+                    )
+                    self.pending_batches.remove(batch_id)
+                    continue
+                if batch.status not in ('completed', 'expired', 'cancelled'):
+                    continue
+                if batch.status != 'completed':
+                    logger.warning(f"Batch {batch_id} ended as {batch.status}; delivering the requests it finished")
+                output = self.openai_client.files.content(batch.output_file_id).text if batch.output_file_id else ''
+            except openai.APIError as e:
+                logger.error(f"Could not check batch {batch_id}: {e}")
+                continue
+
+            delivered = set()
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    item = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    # Its subreddit is reported below along with the other missing ones
+                    logger.error(f"Skipping malformed line in the output of batch {batch_id}: {e}")
+                    continue
+                subreddit = item.get('custom_id')
+                if subreddit not in pending['subreddits']:
+                    continue
+                cache_key, post_count = pending['subreddits'][subreddit]
+                try:
+                    analysis = item['response']['body']['choices'][0]['message']['content'].strip()
+                except (KeyError, IndexError, TypeError, AttributeError):
+                    logger.error(f"Batch {batch_id} has no analysis for r/{subreddit}: {item.get('error')}")
+                    continue
+                if analysis:
+                    self.analysis_cache.set(cache_key, analysis)
+                    results.append((pending['chat_id'], subreddit, post_count, analysis))
+                    delivered.add(subreddit)
+            # Requests that failed inside a finished batch only show up in its error file
+            missing = [sub for sub in pending['subreddits'] if sub not in delivered]
+            if missing:
+                logger.error(f"Batch {batch_id} failed for {', '.join(missing)} (error file: {batch.error_file_id})")
+                results.extend((pending['chat_id'], sub, pending['subreddits'][sub][1], None) for sub in missing)
+            self.pending_batches.remove(batch_id)
+        return results
+
 class TelegramBot:
     """Main Telegram bot class"""
     
+    WELCOME_TEMPLATE = (
+        "<b>🤖 Personal Reddit Analyzer Bot</b>\n\n"
+        "I analyze Reddit posts and comments to extract valuable insights using AI!\n\n"
+        "<b>Commands:</b>\n"
+        "• /start - Show this welcome message\n"
+        "• /analyze - Manually trigger analysis now\n"
+        "• /subreddits - View and manage your subreddits\n"
+        "• /status - Check bot status and statistics\n\n"
+        "I automatically analyze posts every 2 hours.\n\n"
+        "<b>Current Subreddits:</b> {subreddits}"
+    )
+    
+    STATUS_TEMPLATE = (
+        "<b>📊 Bot Status</b>\n\n"
+        "🔹 <b>Active Subreddits:</b> {subreddit_count}\n"
+        "🔹 <b>Processed Posts (last 7 days):</b> {processed_count}\n"
+        "🔹 <b>Auto-Analysis:</b> Every 2 hours\n\n"
+        "<b>Monitored Subreddits:</b>\n"
+        "{subreddits}"
+    )
+    
+    # Opening or closing tag of Telegram's HTML subset
+    HTML_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)[^>]*>')
+    # The start of a tag that a split cut off before its closing '>'
+    CUT_TAG = re.compile(r'</?[A-Za-z][^<>]*$')
+    # Room kept free in each part for tags repeated across a split
+    TAG_SLACK = 256
+    
     def __init__(self, config: Config):
         self.config = config
         self.bot = telebot.TeleBot(config.telegram_token)
-        self.reddit_analyzer = RedditAnalyzer(config)
-        self.scheduler = BackgroundScheduler(timezone="UTC")
+        # One connection pool for the Telegram and Reddit APIs; telebot would
+        # otherwise open a fresh session in every analysis thread
+        self.http_session = build_http_session()
+        telebot.apihelper.session = self.http_session
+        self.reddit_analyzer = RedditAnalyzer(config, http_session=self.http_session)
+        # A single job runs every 2 hours, so one worker thread is all the
+        # scheduler needs; missed or overlapping runs collapse into one
+        self.scheduler = BackgroundScheduler(
+            timezone="UTC",
+            executors={'default': SchedulerThreadPool(max_workers=1)},
+            job_defaults={'coalesce': True, 'max_instances': 1}
+        )
+        # Telegram allows about one message per second to the same chat
+        self.min_send_interval = 1.0
+        self._send_lock = threading.Lock()
+        self._next_send_at: Dict[int, float] = {}
+        # Analysis results go out through a sender thread of their own, so
+        # waiting out the per-chat pacing doesn't hold up the analysis loop
+        self._outbox = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='telegram-send'
+        )
+        # One long-lived thread works through analysis requests in order
+        self._analysis_runner = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='analysis-run'
+        )
         self._setup_handlers()
         self._start_scheduler()
     
-    def _run_analysis_in_thread(self, chat_id):
-        """Helper to run analysis in a new thread to avoid blocking the bot."""
-        analysis_thread = threading.Thread(target=self._perform_analysis, args=(chat_id,))
-        analysis_thread.start()
+    def _queue_analysis(self, chat_id, batch: bool = False) -> concurrent.futures.Future:
+        """Queue an analysis run on the analysis worker so polling stays responsive.
+
+        Runs execute one at a time in the order they were requested, so a
+        repeated /analyze or a scheduled run arriving mid-analysis waits its
+        turn instead of fetching and analyzing the same posts in parallel.
+        """
+        return self._analysis_runner.submit(self._run_analysis, chat_id, batch)
+
+    def _run_analysis(self, chat_id, batch: bool = False):
+        try:
+            if batch:
+                self._perform_batch_analysis(chat_id)
+            else:
+                self._perform_analysis(chat_id)
+        except Exception as e:
+            logger.error(f"Analysis for chat_id {chat_id} failed: {e}", exc_info=True)
 
     def _setup_handlers(self):
         """Setup bot command and callback handlers"""
         @self.bot.message_handler(commands=['start'])
         def send_welcome(message):
-            welcome_text = (
-                f"<b>🤖 Personal Reddit Analyzer Bot</b>\n\n"
-                f"I analyze Reddit posts and comments to extract valuable insights using AI!\n\n"
-                f"<b>Commands:</b>\n"
-                f"• /start - Show this welcome message\n"
-                f"• /analyze - Manually trigger analysis now\n"
-                f"• /subreddits - View and manage your subreddits\n"
-                f"• /status - Check bot status and statistics\n\n"
-                f"I automatically analyze posts every 2 hours.\n\n"
-                f"<b>Current Subreddits:</b> {', '.join(f'r/{sub}' for sub in self.config.subreddits)}"
-            )
+            welcome_text = self.WELCOME_TEMPLATE.format(subreddits=self.config.subreddits_joined)
             keyboard = InlineKeyboardMarkup()
             keyboard.row(
                 InlineKeyboardButton("🔄 Analyze Now", callback_data="analyze_now"),
@@ -298,7 +1283,7 @@ class TelegramBot:
         @self.bot.message_handler(commands=['analyze'])
         def manual_analyze(message):
             self.bot.reply_to(message, "🔄 Analysis has been started in the background. I'll send the results shortly.")
-            self._run_analysis_in_thread(message.chat.id)
+            self._queue_analysis(message.chat.id)
         
         @self.bot.message_handler(commands=['subreddits'])
         def show_subreddits(message):
@@ -306,16 +1291,11 @@ class TelegramBot:
         
         @self.bot.message_handler(commands=['status'])
         def show_status(message):
-            subreddits_list = '\n'.join(f'• r/{sub}' for sub in self.config.subreddits)
-
-            status_text = (
-    f"<b>📊 Bot Status</b>\n\n"
-    f"🔹 <b>Active Subreddits:</b> {len(self.config.subreddits)}\n"
-    f"🔹 <b>Processed Posts (since last restart):</b> {len(self.reddit_analyzer.processed_posts)}\n"
-    f"🔹 <b>Auto-Analysis:</b> Every 2 hours\n\n"
-    f"<b>Monitored Subreddits:</b>\n"
-    f"{subreddits_list}"
-)
+            status_text = self.STATUS_TEMPLATE.format(
+                subreddit_count=len(self.config.subreddits),
+                processed_count=len(self.reddit_analyzer.processed_posts),
+                subreddits=self.config.subreddits_bulleted
+            )
 
             keyboard = InlineKeyboardMarkup()
             keyboard.add(InlineKeyboardButton("🔄 Analyze Now", callback_data="analyze_now"))
@@ -337,7 +1317,7 @@ class TelegramBot:
                 self._show_subreddit_manager(call.message.chat.id, call.message.message_id)
             elif call.data == "analyze_now":
                 self.bot.answer_callback_query(call.id, "Starting analysis in the background...")
-                self._run_analysis_in_thread(call.message.chat.id)
+                self._queue_analysis(call.message.chat.id)
             elif call.data == "edit_subreddits":
                 msg = self.bot.send_message(call.message.chat.id,
                     "<b>📝 Replace Subreddit List</b>\n\nSend a comma-separated list of new subreddits (e.g., Python,datascience,learnpython).",
@@ -359,10 +1339,7 @@ class TelegramBot:
                 self._show_remove_subreddit_menu(call.message.chat.id, call.message.message_id)
 
     def _show_subreddit_manager(self, chat_id, message_id=None):
-        if self.config.subreddits:
-            subreddits_list = '\n'.join(f'• r/{sub}' for sub in self.config.subreddits)
-        else:
-            subreddits_list = 'None'
+        subreddits_list = self.config.subreddits_bulleted or 'None'
 
         text = (
     f"<b>📋 Subreddit Manager</b>\n\n"
@@ -413,10 +1390,10 @@ class TelegramBot:
                 self.bot.reply_to(message, "❌ Invalid input. Please provide at least one subreddit.")
                 return
             self.config.set_subreddits(subreddits)
-            response_text = "<b>✅ Subreddit List Updated!</b>\n\n<b>Now monitoring:</b>\n" + "\n".join(f"• r/{sub}" for sub in subreddits)
+            response_text = "<b>✅ Subreddit List Updated!</b>\n\n<b>Now monitoring:</b>\n" + self.config.subreddits_bulleted
             self.bot.reply_to(message, response_text, parse_mode='HTML')
         except Exception as e:
-            logger.error(f"Error updating subreddits: {e}")
+            logger.exception(f"Error updating subreddits: {e}")
             self.bot.reply_to(message, "❌ An error occurred. Please try again.")
     
     def _process_add_subreddit(self, message):
@@ -431,74 +1408,265 @@ class TelegramBot:
             self.config.add_subreddit(subreddit)
             self.bot.reply_to(message, f"✅ Added r/{subreddit} to your monitoring list!")
         except Exception as e:
-            logger.error(f"Error adding subreddit: {e}")
+            logger.exception(f"Error adding subreddit: {e}")
             self.bot.reply_to(message, "❌ An error occurred. Please try again.")
         
+    def _send_message(self, chat_id, text, **kwargs):
+        """Send a message, pacing sends to the same chat instead of sleeping blindly"""
+        with self._send_lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_send_at.get(chat_id, 0.0))
+            self._next_send_at[chat_id] = send_at + self.min_send_interval
+        if send_at > now:
+            time.sleep(send_at - now)
+        return self.bot.send_message(chat_id, text, **kwargs)
+
+    @staticmethod
+    def _split_message(text: str, limit: int, separators=('\n\n', '\n', '. ', ' ')) -> List[str]:
+        """Split text into parts of at most `limit` characters.
+
+        Each part ends at the last paragraph break that fits, failing that
+        the last line, sentence or word break, so formatting spans are only
+        cut when nothing else fits. Works on indices in a single pass instead
+        of re-slicing the remaining text.
+        """
+        parts = []
+        pos = 0
+        while pos < len(text):
+            end = pos + limit
+            if end >= len(text):
+                end = len(text)
+            else:
+                for sep in separators:
+                    cut = text.rfind(sep, pos, end)
+                    if cut > pos:
+                        end = cut + len(sep)
+                        break
+            part = text[pos:end].rstrip()
+            if part.strip():
+                parts.append(part)
+            pos = end
+        return parts
+
+    @classmethod
+    def _balance_tags(cls, parts: List[str]) -> List[str]:
+        """Close HTML tags left open at the end of each part and reopen them in the next.
+
+        Telegram rejects a message whose HTML does not parse, so formatting
+        that spans a split must be repeated on both sides of it.
+        """
+        balanced = []
+        carry = ''
+        for n, part in enumerate(parts, 1):
+            part = carry + part
+            carry = ''
+            # A tag cut in half moves to the next part whole. A stray '<' in
+            # the text could not be told apart from one, so only a tail short
+            # enough to be a tag is moved, and never all of the part
+            cut = cls.CUT_TAG.search(part) if n < len(parts) else None
+            if cut and len(part) - cut.start() <= cls.TAG_SLACK // 2 and part[:cut.start()].strip():
+                # The split ended at whitespace inside the tag, which _split_message dropped
+                part, carry = part[:cut.start()], part[cut.start():] + ' '
+            open_tags = []
+            for match in cls.HTML_TAG.finditer(part):
+                name = match.group(2).lower()
+                if not match.group(1):
+                    open_tags.append((name, match.group(0)))
+                    continue
+                for i in range(len(open_tags) - 1, -1, -1):
+                    if open_tags[i][0] == name:
+                        del open_tags[i:]
+                        break
+            carry = ''.join(tag for _, tag in open_tags) + carry
+            # Telegram rejects an empty message; nothing but tags is as good as empty
+            if cls.HTML_TAG.sub('', part).strip():
+                balanced.append(part + ''.join(f'</{name}>' for name, _ in reversed(open_tags)))
+        return balanced
+
     def _send_long_message(self, chat_id, text, **kwargs):
         """Splits a long message into multiple parts."""
         max_length = 4096
         if len(text) <= max_length:
-            self.bot.send_message(chat_id, text, **kwargs)
+            self._send_message(chat_id, text, **kwargs)
             return
         
-        parts = []
-        while len(text) > 0:
-            if len(text) > max_length:
-                part = text[:max_length]
-                last_newline = part.rfind('\n')
-                if last_newline != -1:
-                    parts.append(text[:last_newline])
-                    text = text[last_newline+1:]
-                else:
-                    parts.append(text[:max_length])
-                    text = text[max_length:]
-            else:
-                parts.append(text)
-                break
-        
+        continued = "<b>...continued</b>\n\n"
+        parts = self._split_message(text, max_length - len(continued) - self.TAG_SLACK)
+        if kwargs.get('parse_mode') == 'HTML':
+            parts = self._balance_tags(parts)
         for i, part in enumerate(parts):
             if i > 0:
-                self.bot.send_message(chat_id, f"<b>...continued</b>\n\n{part}", **kwargs)
+                self._send_message(chat_id, f"{continued}{part}", **kwargs)
             else:
-                self.bot.send_message(chat_id, part, **kwargs)
-            time.sleep(1)
+                self._send_message(chat_id, part, **kwargs)
+
+    def _send_later(self, send, *args, **kwargs) -> concurrent.futures.Future:
+        """Queue a Telegram send on the sender thread instead of waiting for it.
+
+        Sends go out one at a time in the order they were queued.
+        """
+        future = self._outbox.submit(send, *args, **kwargs)
+        future.add_done_callback(self._log_send_failure)
+        return future
+
+    @staticmethod
+    def _log_send_failure(future: concurrent.futures.Future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed to send a Telegram message: {error}", exc_info=error)
+
+    def _send_analysis(self, chat_id, subreddit: str, posts: List[Dict], analysis: Optional[str]) -> int:
+        """Send one subreddit's analysis and return how many posts it covered"""
+        if not analysis:
+            self._send_message(chat_id, f"Could not generate a summary for r/{subreddit}.")
+            return 0
+        self._send_long_message(chat_id, analysis, parse_mode='HTML', disable_web_page_preview=True)
+        return len(posts)
+
+    def _deliver_analysis(self, chat_id, subreddit: str, posts: List[Dict], analysis: Optional[str]) -> int:
+        """_send_analysis for the sender thread, which tells the chat when the send fails"""
+        try:
+            return self._send_analysis(chat_id, subreddit, posts, analysis)
+        except Exception as e:
+            self._report_failure(chat_id, subreddit, e)
+            return 0
+
+    def _report_failure(self, chat_id, subreddit: str, error: Exception):
+        """Log a subreddit that could not be processed and tell the chat about it"""
+        logger.critical(f"A critical error occurred while processing r/{subreddit}: {error}", exc_info=error)
+        try:
+            self._send_message(chat_id, f"⚠️ An unexpected error occurred while processing r/{subreddit}. Check logs.")
+        except Exception as e:
+            # Not worth stopping the run over; the failure is already logged
+            logger.error(f"Failed to send a Telegram message: {e}", exc_info=True)
 
     def _perform_analysis(self, chat_id):
         logger.info(f"Starting analysis for chat_id: {chat_id}")
-        self.bot.send_message(chat_id, f"🔍 <b>Starting Analysis</b> for {len(self.config.subreddits)} subreddits...", parse_mode='HTML')
-        
-        total_new_posts = 0
-        summary_lines = []
+        self._send_later(self._send_message, chat_id, f"🔍 <b>Starting Analysis</b> for {len(self.config.subreddits)} subreddits...", parse_mode='HTML')
         
-        for subreddit in self.config.subreddits:
-            try:
-                posts = self.reddit_analyzer.fetch_posts(subreddit, limit=8)
-                if not posts:
-                    summary_lines.append(f"• r/{subreddit}: No new posts found.")
-                    continue
+        subreddits = list(self.config.subreddits)
+        summary = {}
+        # Analyses handed to the sender thread; each resolves to its post count
+        sent = []
 
-                summary_lines.append(f"• r/{subreddit}: Found {len(posts)} new posts, analyzing...")
-                self.bot.send_message(chat_id, f"Found {len(posts)} new post(s) in r/{subreddit}. Analyzing now...")
-                
-                analysis = self.reddit_analyzer.analyze_posts_batch(posts)
-                if analysis:
-                    self._send_long_message(chat_id, analysis, parse_mode='HTML', disable_web_page_preview=True)
-                    total_new_posts += len(posts)
-                else:
-                    self.bot.send_message(chat_id, f"Could not generate a summary for r/{subreddit}.")
-                
-                time.sleep(2) # Avoid rate limiting
-            except Exception as e:
-                logger.critical(f"A critical error occurred while processing r/{subreddit}: {e}", exc_info=True)
-                self.bot.send_message(chat_id, f"⚠️ An unexpected error occurred while processing r/{subreddit}. Check logs.")
-        
+        # Each subreddit is analyzed as soon as its fetch finishes, and its
+        # results are sent as soon as they arrive. Sends are queued on the
+        # sender thread, so this loop keeps dispatching fetches and analyses
+        # while Telegram's per-chat pacing plays out. With COMBINE_SUBREDDITS
+        # the analyses wait for every fetch and go out as a single request
+        # instead.
+        to_combine = {}
+        fetches_left = len(subreddits)
+        listings = self.reddit_analyzer.fetch_hot_listings(subreddits, limit=8)
+        pending = {
+            self.reddit_analyzer.submit_fetch(sub, limit=8, submissions=listings.get(sub)): ('fetch', sub, None)
+            for sub in subreddits
+        }
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage, subreddit, posts = pending.pop(future)
+                try:
+                    if stage == 'fetch':
+                        fetches_left -= 1
+                        posts = future.result()
+                        if not posts:
+                            summary[subreddit] = f"• r/{subreddit}: No new posts found."
+                            continue
+
+                        summary[subreddit] = f"• r/{subreddit}: Found {len(posts)} new posts, analyzing..."
+                        if self.config.combine_subreddits:
+                            to_combine[subreddit] = posts
+                        else:
+                            pending[self.reddit_analyzer.submit_analysis(posts)] = ('analysis', subreddit, posts)
+                        self._send_later(self._send_message, chat_id, f"Found {len(posts)} new post(s) in r/{subreddit}. Analyzing now...")
+                    elif stage == 'combined':
+                        analyses = future.result()
+                        for sub, sub_posts in posts.items():
+                            if sub in analyses:
+                                sent.append(self._send_later(self._deliver_analysis, chat_id, sub, sub_posts, analyses[sub]))
+                            else:
+                                pending[self.reddit_analyzer.submit_analysis(sub_posts)] = ('analysis', sub, sub_posts)
+                    else:
+                        sent.append(self._send_later(self._deliver_analysis, chat_id, subreddit, posts, future.result()))
+                except Exception as e:
+                    logger.critical(f"A critical error occurred while processing r/{subreddit}: {e}", exc_info=True)
+                    self._send_later(self._send_message, chat_id, f"⚠️ An unexpected error occurred while processing r/{subreddit}. Check logs.")
+
+            if to_combine and fetches_left == 0:
+                pending[self.reddit_analyzer.submit_combined_analysis(to_combine)] = ('combined', '+'.join(to_combine), to_combine)
+                to_combine = {}
+
+        concurrent.futures.wait(sent)
+        total_new_posts = sum(future.result() for future in sent if future.exception() is None)
+        summary_lines = [summary[sub] for sub in subreddits if sub in summary]
         final_summary = "✅ <b>Analysis Complete!</b>\n\n" + "\n".join(summary_lines)
         if total_new_posts == 0:
             final_summary += "\n\n📭 No new interesting posts found across all subreddits."
 
-        self.bot.send_message(chat_id, final_summary, parse_mode='HTML')
+        # Waited on, so the run only counts as finished once everything is delivered
+        concurrent.futures.wait([self._send_later(self._send_message, chat_id, final_summary, parse_mode='HTML')])
         logger.info(f"Finished analysis for chat_id: {chat_id}")
 
+    def _deliver_batches(self):
+        """Send the results of batches that finished since the last scheduled run"""
+        # Collected batches are no longer pending, so one failed delivery
+        # must not cost the ones after it
+        for result_chat_id, subreddit, post_count, analysis in self.reddit_analyzer.collect_batches():
+            try:
+                if analysis is None:
+                    self._send_message(result_chat_id, f"Could not generate a summary for r/{subreddit}.")
+                    continue
+                self._send_long_message(result_chat_id, analysis, parse_mode='HTML', disable_web_page_preview=True)
+                logger.info(f"Delivered batch analysis of {post_count} post(s) from r/{subreddit}")
+            except Exception as e:
+                self._report_failure(result_chat_id, subreddit, e)
+
+    def _perform_batch_analysis(self, chat_id):
+        """Scheduled variant of _perform_analysis that hands new posts to the Batch API.
+
+        Nobody is waiting on a scheduled run, so its analyses are queued at
+        the batch discount and delivered by whichever run finds them done.
+        """
+        logger.info(f"Starting batch analysis for chat_id: {chat_id}")
+        subreddits = list(self.config.subreddits)
+        listings = self.reddit_analyzer.fetch_hot_listings(subreddits, limit=8)
+        fetches = {
+            self.reddit_analyzer.submit_fetch(sub, limit=8, submissions=listings.get(sub)): sub
+            for sub in subreddits
+        }
+        to_batch = {}
+        for future in concurrent.futures.as_completed(fetches):
+            subreddit = fetches[future]
+            try:
+                posts = future.result()
+                if not posts:
+                    continue
+                instant = self.reddit_analyzer.instant_analysis(posts)
+                if instant:
+                    self._send_analysis(chat_id, subreddit, posts, instant)
+                else:
+                    to_batch[subreddit] = posts
+            except Exception as e:
+                self._report_failure(chat_id, subreddit, e)
+
+        if not to_batch:
+            return
+        if self.reddit_analyzer.submit_batch(to_batch, chat_id):
+            self._send_message(
+                chat_id,
+                f"🕒 Queued {len(to_batch)} subreddit(s) for batch analysis. Results arrive with a later scheduled run."
+            )
+            return
+        # Batch creation failed; don't lose the posts, analyze them now instead
+        analyses = {self.reddit_analyzer.submit_analysis(posts): (sub, posts) for sub, posts in to_batch.items()}
+        for future in concurrent.futures.as_completed(analyses):
+            subreddit, posts = analyses[future]
+            try:
+                self._send_analysis(chat_id, subreddit, posts, future.result())
+            except Exception as e:
+                self._report_failure(chat_id, subreddit, e)
+
     def _start_scheduler(self):
         self.scheduler.add_job(
             func=self._scheduled_analysis,
@@ -511,10 +1679,17 @@ class TelegramBot:
     
     def _scheduled_analysis(self):
         logger.info("Starting scheduled Reddit analysis...")
-        personal_chat_id = os.getenv('PERSONAL_CHAT_ID')
-        if personal_chat_id:
+        try:
+            # Queued like a run so it never overlaps one. Done whatever
+            # USE_BATCH_API says now, so turning it off doesn't strand
+            # batches that are still pending
+            self._analysis_runner.submit(self._deliver_batches).result()
+        except Exception as e:
+            logger.error(f"Error delivering batch results: {e}", exc_info=True)
+        if self.config.personal_chat_id is not None:
             try:
-                self._perform_analysis(int(personal_chat_id))
+                # Waited on, so the scheduler still sees one run at a time
+                self._queue_analysis(self.config.personal_chat_id, batch=self.config.use_batch_api).result()
             except Exception as e:
                 logger.error(f"Error in scheduled analysis task: {e}", exc_info=True)
         else:
@@ -523,7 +1698,13 @@ class TelegramBot:
     def run(self):
         logger.info("Starting Personal Reddit Analyzer Bot...")
         try:
-            self.bot.infinity_polling(timeout=20, long_polling_timeout=10, logger_level=logging.WARNING)
+            # Hold each getUpdates open close to Telegram's 50s maximum and only
+            # ask for the update types we have handlers for
+            self.bot.infinity_polling(
+                timeout=60, long_polling_timeout=50,
+                allowed_updates=['message', 'callback_query'],
+                logger_level=logging.WARNING
+            )
         except Exception as e:
             logger.critical(f"Bot polling CRASHED: {e}", exc_info=True)
             time.sleep(15) # Wait before restarting
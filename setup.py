@@ -3,7 +3,10 @@ Setup script for Reddit Analyzer Bot with colored output
 """
 
 import os
+import re
 import sys
+import venv
+import sysconfig
 import subprocess
 
 # ANSI color codes
@@ -18,12 +21,7 @@ class Colors:
     UNDERLINE = '\033[4m'
     RESET = '\033[0m'
 
-def create_env_file():
-    """Create .env file if it doesn't exist"""
-    if not os.path.exists('.env'):
-        print(f"{Colors.OKBLUE}Creating .env file...{Colors.RESET}")
-        with open('.env', 'w') as f:
-            f.write("""# Telegram Bot Configuration
+ENV_TEMPLATE = """# Telegram Bot Configuration
 TELEGRAM_BOT_TOKEN=your_telegram_bot_token_here
 
 # OpenAI Configuration  
@@ -43,25 +41,11 @@ REDDIT_USER_AGENT=RedditAnalyzerBot/1.0
 
 # Personal Chat ID (get this by messaging your bot and checking logs)
 PERSONAL_CHAT_ID=your_telegram_chat_id_here
-""")
-        print(f"{Colors.OKGREEN}✅ Created .env file - please fill in your API credentials{Colors.RESET}")
-    else:
-        print(f"{Colors.OKGREEN}✅ .env file already exists{Colors.RESET}")
-
-def create_config_files():
-    """Create default config files if they don't exist"""
-    if not os.path.exists('subreddits.txt'):
-        print(f"{Colors.OKBLUE}Creating subreddits.txt...{Colors.RESET}")
-        with open('subreddits.txt', 'w') as f:
-            f.write("Programming\nTechnology")
-        print(f"{Colors.OKGREEN}✅ Created subreddits.txt with default subreddits{Colors.RESET}")
-    else:
-        print(f"{Colors.OKGREEN}✅ subreddits.txt already exists{Colors.RESET}")
-    
-    if not os.path.exists('prompt.txt'):
-        print(f"{Colors.OKBLUE}Creating prompt.txt...{Colors.RESET}")
-        with open('prompt.txt', 'w') as f:
-            f.write("""
+"""
+
+DEFAULT_SUBREDDITS = "Programming\nTechnology"
+
+DEFAULT_PROMPT = """
 Start your summary with name of community
 
 Analyze the following Reddit post and comments. Extract and summarize:
@@ -105,32 +89,136 @@ You are a telegram bot.
 
     Do NOT use any unsupported tags such as <ul>, <li>, <div>, <span>, <h1>, etc.
 
-    Goal: Ensure the text is valid for Telegram and won’t cause any tag parsing errors.""")
-        print(f"{Colors.OKGREEN}✅ Created prompt.txt with default analysis prompt{Colors.RESET}")
+    Goal: Ensure the text is valid for Telegram and won’t cause any tag parsing errors."""
+
+# File name, default contents (encoded once here), mode and message shown once it's created
+FILES = (
+    ('.env', ENV_TEMPLATE.encode('utf-8'), 0o600, "Created .env file - please fill in your API credentials"),
+    ('subreddits.txt', DEFAULT_SUBREDDITS.encode('utf-8'), 0o666, "Created subreddits.txt with default subreddits"),
+    ('prompt.txt', DEFAULT_PROMPT.encode('utf-8'), 0o666, "Created prompt.txt with default analysis prompt"),
+)
+
+def ensure_files():
+    """Create the .env and config files that don't exist yet"""
+    for name, body, mode, created in FILES:
+        try:
+            # O_EXCL makes the existence check and the create a single step;
+            # O_BINARY stops Windows from turning each \n into \r\n
+            fd = os.open(name, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0), mode)
+        except FileExistsError:
+            print(f"{Colors.OKGREEN}✅ {name} already exists{Colors.RESET}")
+            continue
+        print(f"{Colors.OKBLUE}Creating {name}...{Colors.RESET}")
+        try:
+            os.write(fd, body)
+        finally:
+            os.close(fd)
+        print(f"{Colors.OKGREEN}✅ {created}{Colors.RESET}")
+
+def pip_options():
+    """Flags for every pip install: no self-update check, and a wheel cache
+    only when REDDIT_BOT_PIP_CACHE points at one worth keeping"""
+    options = ["--disable-pip-version-check"]
+    cache_dir = os.environ.get("REDDIT_BOT_PIP_CACHE")
+    if cache_dir:
+        options.append(f"--cache-dir={cache_dir}")
     else:
-        print(f"{Colors.OKGREEN}✅ prompt.txt already exists{Colors.RESET}")
+        options.append("--no-cache-dir")
+    return options
+
+def host_pip_can_target():
+    """Whether the pip running setup is 22.3 or newer, which can install into
+    another environment with --python"""
+    try:
+        result = subprocess.run([sys.executable, "-m", "pip", "--version"],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    match = re.match(r"pip (\d+)\.(\d+)", result.stdout)
+    return bool(match) and (int(match.group(1)), int(match.group(2))) >= (22, 3)
+
+# Where a virtual environment keeps its executables
+_BIN = "Scripts" if os.name == "nt" else "bin"
+
+def find_wheelhouse():
+    """Local wheel directory to install from instead of PyPI, if one is shipped.
+
+    Wheels for this platform are looked up in wheels/<platform> (e.g.
+    wheels/linux_x86_64, wheels/macosx_arm64, wheels/win_amd64) before
+    falling back to wheels/ itself.
+    """
+    wheels = os.path.join(os.getcwd(), "wheels")
+    platform = re.sub(r"[-.]", "_", sysconfig.get_platform())
+    # macOS platform names carry the SDK version, which the directory names leave out
+    platform = re.sub(r"^macosx_\d+_\d+_", "macosx_", platform)
+    for path in (os.path.join(wheels, platform), wheels):
+        # wheels/ may only hold other platforms' directories; installing from it
+        # with --no-index would then fail where PyPI would have worked
+        if os.path.isdir(path) and any(name.endswith(".whl") for name in os.listdir(path)):
+            return path
+    return None
 
 def install_requirements():
     """Install packages from requirements.txt in a virtual environment."""
     venv_path = os.path.join(os.getcwd(), ".venv")
-    if not os.path.exists(venv_path):
+    bin_dir = os.path.join(venv_path, _BIN)
+    venv_cfg = os.path.join(venv_path, "pyvenv.cfg")
+    # pyvenv.cfg is touched after every successful install, so one stat
+    # tells both whether the environment exists and whether it is current
+    try:
+        venv_mtime = os.stat(venv_cfg).st_mtime
+    except FileNotFoundError:
+        venv_mtime = 0
+    if venv_mtime > os.stat("requirements.txt").st_mtime:
+        print(f"{Colors.OKGREEN}✅ Virtual environment is up to date{Colors.RESET}")
+        return
+    # A recent enough host pip can fill the new environment directly, so
+    # there is no need to bootstrap a second pip into it with ensurepip first
+    use_host_pip = host_pip_can_target()
+    if not venv_mtime:
         print(f"{Colors.OKBLUE}Creating virtual environment...{Colors.RESET}")
-        subprocess.run([sys.executable, "-m", "venv", ".venv"], check=True)
+        # Built in-process instead of through `python -m venv`; symlinking the
+        # interpreter (not possible on Windows) skips copying it. pip gets
+        # upgraded below anyway, so upgrade_deps stays off
+        venv.EnvBuilder(symlinks=(os.name != "nt"), with_pip=not use_host_pip).create(venv_path)
 
     print(f"{Colors.OKBLUE}Installing requirements...{Colors.RESET}")
-    pip_path = os.path.join(venv_path, "bin" if os.name != "nt" else "Scripts", "pip")
+    python_path = os.path.join(bin_dir, "python.exe" if os.name == "nt" else "python")
+    if use_host_pip:
+        pip_install = [sys.executable, "-m", "pip", "--python", python_path, "install"]
+    else:
+        # Through the interpreter, not the pip script: on Windows pip refuses
+        # to upgrade itself while running as Scripts\pip.exe
+        pip_install = [python_path, "-m", "pip", "install"]
+    pip_install += pip_options()
+    wheelhouse = find_wheelhouse()
+    if wheelhouse:
+        print(f"{Colors.OKBLUE}Installing offline from {wheelhouse}{Colors.RESET}")
+        pip_install += ["--no-index", "--find-links", wheelhouse]
+    # One pip run installs the requirements along with current pip, wheel
+    # and setuptools, so the environment has its own pip and build tools
+    # for any dependency that only ships a source distribution
+    packages = ["--upgrade", "pip", "wheel", "setuptools", "-r", "requirements.txt"]
     try:
-        subprocess.run([pip_path, "install", "-r", "requirements.txt"], check=True)
+        try:
+            # Wheels only: no compiler needed and no per-package build environments
+            subprocess.run(pip_install + ["--only-binary=:all:"] + packages, check=True)
+        except subprocess.CalledProcessError:
+            print(f"{Colors.WARNING}⚠️  Some requirements have no wheel for this platform - "
+                  f"retrying with source builds allowed (see pip's output above){Colors.RESET}")
+            subprocess.run(pip_install + ["--prefer-binary"] + packages, check=True)
+        os.utime(venv_cfg)
         print(f"{Colors.OKGREEN}✅ Requirements installed{Colors.RESET}")
     except subprocess.CalledProcessError:
+        # A freshly created pyvenv.cfg would otherwise look up to date next run
+        os.utime(venv_cfg, (0, 0))
         print(f"{Colors.FAIL}❌ Failed to install requirements{Colors.RESET}")
         sys.exit(1)
 
 def main():
     print(f"{Colors.HEADER}🤖 Setting up Reddit Analyzer Bot...{Colors.RESET}")
     
-    create_env_file()
-    create_config_files()
+    ensure_files()
     
     if os.path.exists('requirements.txt'):
         install_requirements()